@@ -0,0 +1,73 @@
+# Author: Sam Lehmann
+# Network with him at: https://www.linkedin.com/in/samuellehmann/
+# Date: 2026-14-10
+# Description: Compiled kernels for calculating nodal temperatures using the finite difference method.
+
+try:
+    from numba import njit, prange
+
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+if HAS_NUMBA:
+
+    @njit(cache=True, boundscheck=False)
+    def update_ghost_nodes(t):
+        """Mirrors the nodes next to the insulated walls into the ghost nodes
+
+        Args:
+            t (np.ndarray): Nodal temperatures at a timestep, padded with ghost nodes
+        """
+        t[0, 1:-1] = t[2, 1:-1]
+        t[-1, 1:-1] = t[-3, 1:-1]
+        t[1:-1, 0] = t[1:-1, 2]
+        t[1:-1, -1] = t[1:-1, -3]
+
+    @njit(cache=True, parallel=True, fastmath=True, boundscheck=False)
+    def step_kernel(t, t_new, fixed_idx, fixed_vals, tau, c_n):
+        """Calculates nodal temperatures in a mesh for a single timestep
+
+        Args:
+            t (np.ndarray): Nodal temperatures at the current timestep, padded with up to date ghost nodes
+            t_new (np.ndarray): Padded array to write nodal temperatures at the next timestep to
+            fixed_idx (np.ndarray): Flat indices of the fixed nodes in a padded timestep
+            fixed_vals (np.ndarray): Temperatures of the fixed nodes
+            tau (float): Mesh fourier number
+            c_n (float): Coefficient for the node being calculated, equal to 1-4tau
+        """
+        n = t.shape[0] - 2
+        for x in prange(1, n + 1):
+            for y in range(1, n + 1):
+                t_new[x, y] = tau * (
+                    t[x - 1, y] + t[x, y + 1] + t[x + 1, y] + t[x, y - 1]
+                ) + c_n * (t[x, y])
+
+        # Reapply fixed temperature boundary conditions
+        t_new_flat = t_new.reshape(-1)
+        for i in range(fixed_idx.size):
+            t_new_flat[fixed_idx[i]] = fixed_vals[i]
+
+    @njit(cache=True, boundscheck=False)
+    def run_kernel(temp_history, fixed_idx, fixed_vals, tau, c_n, n_steps):
+        """Calculates nodal temperatures in a mesh for a number of timesteps
+
+        Args:
+            temp_history (np.ndarray): Nodal temperatures for each time index, starting from the initial values and padded with ghost nodes
+            fixed_idx (np.ndarray): Flat indices of the fixed nodes in a padded timestep
+            fixed_vals (np.ndarray): Temperatures of the fixed nodes
+            tau (float): Mesh fourier number
+            c_n (float): Coefficient for the node being calculated, equal to 1-4tau
+            n_steps (int): Number of timesteps to calculate
+        """
+        for step in range(n_steps):
+            update_ghost_nodes(temp_history[step])
+            step_kernel(
+                temp_history[step],
+                temp_history[step + 1],
+                fixed_idx,
+                fixed_vals,
+                tau,
+                c_n,
+            )
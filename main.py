@@ -4,80 +4,154 @@
 # Description: Calculates temperature results for a nodal mesh using the finite difference method.
 
 import time
+from typing import List
 
 import matplotlib.colors as mcol
 import matplotlib.pyplot as plt
 import numpy as np
 
+from kernels import HAS_NUMBA
 from mesh import Mesh
 
+if HAS_NUMBA:
+    from kernels import run_kernel, step_kernel
 
-def calc_time_iteration(mesh: Mesh, tau: float):
-    """Calculates nodal temperature values in a mesh for a timestep
+
+def calc_time_iterations(mesh: Mesh, tau: float, n_steps: int):
+    """Calculates nodal temperature values in a mesh for a number of timesteps
 
     Args:
         mesh (Mesh): The mesh to calculate temperatures for
         tau (float): Mesh fourier number
+        n_steps (int): Number of timesteps to calculate from the initial values
+    """
+    if HAS_NUMBA and mesh.backend == "numpy":
+        # Keep the coefficients in the same precision as the stored temperatures
+        tau = mesh.dtype(tau)
+        c_n = mesh.dtype(1 - 4 * tau)
+        run_kernel(
+            mesh._temp_history, mesh.fixed_idx, mesh.fixed_vals, tau, c_n, n_steps
+        )
+        mesh.temp = mesh.temp_history[n_steps]
+        return
+
+    for step in range(0, n_steps):
+        calc_time_iteration(mesh, tau, step)
+
+
+def calc_batch_time_iterations(meshes: List[Mesh], taus: List[float], n_steps: int):
+    """Calculates nodal temperature values for a batch of independent meshes in lockstep
+
+    Args:
+        meshes (List[Mesh]): Meshes to calculate temperatures for. Must share a size, backend and dtype
+        taus (List[float]): Mesh fourier number for each mesh
+        n_steps (int): Number of timesteps to calculate from the initial values
     """
-    for x in range(0, mesh.mesh_size):
-        for y in range(0, mesh.mesh_size):
-            t_left = mesh.get_node_temp_or_none(x - 1, y)
-            t_right = mesh.get_node_temp_or_none(x + 1, y)
-            t_top = mesh.get_node_temp_or_none(x, y + 1)
-            t_bottom = mesh.get_node_temp_or_none(x, y - 1)
+    mesh = meshes[0]
+    for other in meshes[1:]:
+        if (other.mesh_size, other.backend, other.dtype) != (
+            mesh.mesh_size,
+            mesh.backend,
+            mesh.dtype,
+        ):
+            raise ValueError("Batched meshes must share a size, backend and dtype")
+
+    xp = mesh.xp
+    tau = xp.asarray(taus, dtype=mesh.dtype)[:, None, None]
+    c_n = 1 - 4 * tau
+
+    # Offset each mesh's fixed node indices into the flattened batch
+    slab_size = (mesh.mesh_size + 2) ** 2
+    fixed_idx = xp.concatenate(
+        [m.fixed_idx + i * slab_size for i, m in enumerate(meshes)]
+    )
+    fixed_vals = xp.concatenate([m.fixed_vals for m in meshes])
+
+    t = xp.stack([m._temp_history[0] for m in meshes])
+    t_new = xp.empty_like(t)
+    for step in range(0, n_steps):
+        # Mirror the nodes next to the insulated walls into the ghost nodes
+        t[:, 0, 1:-1] = t[:, 2, 1:-1]
+        t[:, -1, 1:-1] = t[:, -3, 1:-1]
+        t[:, 1:-1, 0] = t[:, 1:-1, 2]
+        t[:, 1:-1, -1] = t[:, 1:-1, -3]
+
+        t_new[:, 1:-1, 1:-1] = get_temp(
+            tau,
+            c_n,
+            t[:, 1:-1, 1:-1],
+            t[:, :-2, 1:-1],
+            t[:, 2:, 1:-1],
+            t[:, 1:-1, 2:],
+            t[:, 1:-1, :-2],
+        )
+        t_new.reshape(-1)[fixed_idx] = fixed_vals
+
+        for i, m in enumerate(meshes):
+            m._temp_history[step + 1] = t_new[i]
+        t, t_new = t_new, t
+
+    for m in meshes:
+        m.temp = m.temp_history[n_steps]
+
 
-            if x == 0:
-                t_left = None
+def calc_time_iteration(mesh: Mesh, tau: float, step: int):
+    """Calculates nodal temperature values in a mesh for a timestep
 
-            if y == 0:
-                t_bottom = None
+    Args:
+        mesh (Mesh): The mesh to calculate temperatures for
+        tau (float): Mesh fourier number
+        step (int): Time index to calculate the next timestep from
+    """
+    # Keep the coefficients in the same precision as the stored temperatures
+    tau = mesh.dtype(tau)
+    c_n = mesh.dtype(1 - 4 * tau)
 
-            if x == mesh.mesh_size - 1:
-                t_right = None
+    t_new = mesh._temp_history[step + 1]
+    mesh.temp = mesh.temp_history[step + 1]
 
-            if y == mesh.mesh_size - 1:
-                t_top = None
+    if HAS_NUMBA and mesh.backend == "numpy":
+        mesh.update_ghost_nodes(step)
+        step_kernel(
+            mesh._temp_history[step], t_new, mesh.fixed_idx, mesh.fixed_vals, tau, c_n
+        )
+        return
 
-            # Check if edge or corner boundary and mirror where appropriate
-            if t_left is None:
-                t_left = t_right
-            if t_right is None:
-                t_right = t_left
-            if t_top is None:
-                t_top = t_bottom
-            if t_bottom is None:
-                t_bottom = t_top
+    t_left, t_right, t_top, t_bottom = mesh.get_neighbor_temps_all(step)
+    t_new[1:-1, 1:-1] = get_temp(
+        tau, c_n, mesh.temp_history[step], t_left, t_right, t_top, t_bottom
+    )
 
-            t_node_i = mesh.nodes[mesh.get_node_id(x, y)].temp[-1]
-            mesh.nodes[mesh.get_node_id(x, y)].temp.append(
-                get_temp(tau, t_node_i, t_left, t_right, t_top, t_bottom)
-            )
+    # Reapply fixed temperature boundary conditions
+    t_new.reshape(-1)[mesh.fixed_idx] = mesh.fixed_vals
 
 
 def get_temp(
     tau: float,
-    t_node_i: float,
-    t_left: float,
-    t_right: float,
-    t_top: float,
-    t_bottom: float,
+    c_n: float,
+    t_node_i: np.ndarray,
+    t_left: np.ndarray,
+    t_right: np.ndarray,
+    t_top: np.ndarray,
+    t_bottom: np.ndarray,
 ):
-    """Calculates the temperature of a given node at the next timestep
+    """Calculates the temperature of a set of nodes at the next timestep
 
     Args:
         tau (float): Mesh fourier number
-        t_node_i (float): Temperature at the given node at the current timestep
-        t_left (float): Temperature at the left node at the current timestep.
-        t_right (float): Temperature at the right node at the current timestep.
-        t_top (float): Temperature at the top node at the current timestep.
-        t_bottom (float): Temperature at the bottom node at the current timestep.
+        c_n (float): Coefficient for the given nodes, equal to 1-4tau
+        t_node_i (np.ndarray): Temperature at the given nodes at the current timestep
+        t_left (np.ndarray): Temperature at the left nodes at the current timestep.
+        t_right (np.ndarray): Temperature at the right nodes at the current timestep.
+        t_top (np.ndarray): Temperature at the top nodes at the current timestep.
+        t_bottom (np.ndarray): Temperature at the bottom nodes at the current timestep.
 
     Returns:
-        float: Temperature at the node at the next timestep
+        np.ndarray: Temperature at the nodes at the next timestep
     """
     # Driving FDM Equation Without Heat Generation
     # T_Node_i+1 = tau(T_left_i + T_top_i + T_right_i + T_bottom_i) + (1-4tau)(T_Node_i)
-    return tau * (t_left + t_top + t_right + t_bottom) + (1 - 4 * tau) * (t_node_i)
+    return tau * (t_left + t_top + t_right + t_bottom) + c_n * (t_node_i)
 
 
 def print_mesh_temps(mesh: Mesh, index: int):
@@ -88,10 +162,8 @@ def print_mesh_temps(mesh: Mesh, index: int):
         index (int): Time index of interest
     """
     line = ""
-    for x in range(0, mesh.mesh_size):
-        for y in range(0, mesh.mesh_size):
-            line += f"{mesh.get_node_temp_or_nil(x, y):.2f} "
-        line += "\n"
+    for row in mesh.asnumpy(mesh.temp_history[index]):
+        line += " ".join(f"{temp:.2f}" for temp in row) + "\n"
 
     print(line)
 
@@ -103,7 +175,7 @@ def show_plot(mesh: Mesh, time_step: float):
         mesh (Mesh): The mesh to plot nodal temperatures for
         time_step (float): The step in time between each time index
     """
-    plt.plot()
+    fig, ax = plt.subplots()
     plt.ion()
     plt.show()
 
@@ -112,28 +184,26 @@ def show_plot(mesh: Mesh, time_step: float):
         "MyCmapName", ["b", "#00FF00", "#FFF000", "r"]
     )
 
-    for time_index in range(0, len(mesh.nodes[0].temp)):
-        start = time.time()
-
-        plt.title(f"Temperature for time = {time_step*time_index:.2f}")
+    temp_history = mesh.asnumpy(mesh.temp_history)
 
-        # Generate Z values
-        z_vals = np.zeros([mesh.mesh_size, mesh.mesh_size])
-
-        for x in range(0, mesh.mesh_size):
-            for y in range(0, mesh.mesh_size):
-                z_vals[x, y] = mesh.nodes[mesh.get_node_id(x, y)].temp[time_index]
+    # Draw the image once and update its data for each time index
+    im = ax.imshow(
+        temp_history[0],
+        cmap=cmap,
+        origin="lower",
+        vmin=temp_history.min(),
+        vmax=temp_history.max(),
+    )
+    fig.colorbar(im)
 
-        im = plt.pcolormesh(
-            range(0, mesh.mesh_size), range(0, mesh.mesh_size), z_vals, cmap=cmap
-        )
+    for time_index in range(0, len(temp_history)):
+        start = time.time()
 
-        if time_index == 0:
-            # Set the colourmap on the first iteration. This step will contain the minimum and maximum values
-            plt.gcf().colorbar(im)
+        ax.set_title(f"Temperature for time = {time_step*time_index:.2f}")
+        im.set_data(temp_history[time_index])
 
-        plt.draw()
-        plt.pause(time_step - (time.time() - start))
+        fig.canvas.draw_idle()
+        plt.pause(max(1e-3, time_step - (time.time() - start)))
 
 
 if __name__ == "__main__":
@@ -147,13 +217,14 @@ if __name__ == "__main__":
     mesh_size = 51
     init_values = 21.1
 
+    n_steps = int(total_time / time_step)
+
     tau = k / density / heat_capacity * time_step
     print(f"Tau {tau}")
 
     mesh = Mesh(mesh_size)
-    mesh.init_values(bcs, init_values)
+    mesh.init_values(bcs, init_values, n_steps)
 
-    for _ in range(0, int(total_time / time_step)):
-        calc_time_iteration(mesh, tau)
+    calc_time_iterations(mesh, tau, n_steps)
 
     show_plot(mesh, time_step)
@@ -0,0 +1,83 @@
+# Author: Sam Lehmann
+# Network with him at: https://www.linkedin.com/in/samuellehmann/
+# Date: 2026-14-10
+# Description: Builds the finite difference method as a sparse matrix operator for a nodal mesh.
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+from mesh import Mesh
+
+
+def gen_matrix(mesh: Mesh, tau: float) -> scipy.sparse.csr_matrix:
+    """Generates the matrix that advances flattened nodal temperatures by one timestep
+
+    Args:
+        mesh (Mesh): The mesh to generate the matrix for
+        tau (float): Mesh fourier number
+
+    Returns:
+        scipy.sparse.csr_matrix: Matrix of size mesh_size^2 by mesh_size^2, indexed by node id
+    """
+    n = mesh.mesh_size
+    ids = mesh.asnumpy(mesh._id_grid)
+
+    # Neighbour coordinates, mirrored across the insulated walls
+    coords = np.arange(n)
+    lower = np.abs(coords - 1)
+    upper = n - 1 - np.abs(n - 2 - coords)
+
+    # Each node contributes tau to each of its four neighbours and (1-4tau) to itself
+    rows = np.tile(ids.ravel(), 5)
+    cols = np.concatenate(
+        [
+            ids[lower, :].ravel(),
+            ids[:, upper].ravel(),
+            ids[upper, :].ravel(),
+            ids[:, lower].ravel(),
+            ids.ravel(),
+        ]
+    )
+    data = np.repeat([tau, tau, tau, tau, 1 - 4 * tau], n * n).astype(mesh.dtype)
+
+    # Fixed temperature nodes keep their value
+    is_fixed = mesh.asnumpy(mesh.is_fixed).ravel()
+    keep = ~np.tile(is_fixed, 5)
+    fixed_ids = ids.ravel()[is_fixed]
+    rows = np.concatenate([rows[keep], fixed_ids])
+    cols = np.concatenate([cols[keep], fixed_ids])
+    data = np.concatenate([data[keep], np.ones(fixed_ids.size, dtype=mesh.dtype)])
+
+    # Duplicate entries from mirrored neighbours are summed
+    return scipy.sparse.csr_matrix((data, (rows, cols)), shape=(n * n, n * n))
+
+
+def calc_time_iterations_sparse(
+    mesh: Mesh, tau: float, n_steps: int, implicit: bool = False
+):
+    """Calculates nodal temperature values in a mesh for a number of timesteps using sparse matrix operations
+
+    Args:
+        mesh (Mesh): The mesh to calculate temperatures for
+        tau (float): Mesh fourier number
+        n_steps (int): Number of timesteps to calculate from the initial values
+        implicit (bool, optional): Use the unconditionally stable implicit formulation rather than the explicit formulation. Defaults to False.
+    """
+    n = mesh.mesh_size
+    matrix = gen_matrix(mesh, tau)
+
+    if implicit:
+        # The explicit matrix is I + tau*A, so the implicit step solves (I - tau*A)T_i+1 = T_i
+        identity = scipy.sparse.identity(n * n, dtype=mesh.dtype, format="csr")
+        solve = scipy.sparse.linalg.splu((2 * identity - matrix).tocsc()).solve
+    else:
+        solve = matrix.dot
+
+    ids = mesh.asnumpy(mesh._id_grid)
+    temps = mesh.asnumpy(mesh.temps_by_id(mesh.temp_history[0]))
+    for step in range(0, n_steps):
+        temps = solve(temps)
+        mesh.temp_history[step + 1] = mesh.xp.asarray(temps[ids])
+
+    mesh.temp = mesh.temp_history[n_steps]
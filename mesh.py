@@ -3,48 +3,228 @@
 # Date: 2024-18-07
 # Description: Calculates temperature results for a nodal mesh using the finite difference method.
 
+from functools import lru_cache
 from typing import List, Tuple
 
+import numpy as np
+
+try:
+    import cupy
+
+    HAS_CUPY = True
+except ImportError:
+    HAS_CUPY = False
+
+BACKENDS = ("numpy", "cuda", "cupy")
+ORDERS = ("row", "morton")
+
+
+@lru_cache(maxsize=None)
+def _morton_ids(mesh_size: int) -> np.ndarray:
+    """Numbers the nodes of a mesh along a Morton (Z-order) curve. Cached per mesh size
+
+    Args:
+        mesh_size (int): Number of nodes along each side of the mesh
+
+    Returns:
+        np.ndarray: Node id at each set of coordinates, numbered from 0 to mesh_size^2 - 1
+    """
+    # Interleave the bits of x and y so nearby nodes in both directions get nearby codes
+    coords = np.arange(mesh_size, dtype=np.uint64)
+    spread = np.zeros(mesh_size, dtype=np.uint64)
+    for bit in range(max(mesh_size - 1, 1).bit_length()):
+        spread |= ((coords >> np.uint64(bit)) & np.uint64(1)) << np.uint64(2 * bit)
+    codes = (spread[:, None] << np.uint64(1)) | spread[None, :]
+
+    # Rank the codes so ids stay contiguous when mesh_size is not a power of two
+    ids = np.empty(mesh_size**2, dtype=np.int32)
+    ids[np.argsort(codes.ravel(), kind="stable")] = np.arange(mesh_size**2)
+
+    # The result is shared between meshes of the same size
+    ids.flags.writeable = False
+    return ids.reshape(mesh_size, mesh_size)
+
 
 class Mesh:
     """
     Handles the Mesh and Boundary Conditions
     """
 
-    def __init__(self, mesh_size: int):
+    def __init__(
+        self,
+        mesh_size: int,
+        backend: str = "numpy",
+        order: str = "row",
+        dtype: type = np.float32,
+    ):
+        """
+        Args:
+            mesh_size (int): Number of nodes along each side of the mesh
+            backend (str, optional): Array backend to store the mesh with, either "numpy" or "cuda" ("cupy" is an alias of "cuda"). Defaults to "numpy".
+            order (str, optional): Order to number nodes in, either "row" for row-major or "morton" for a Z-order curve. Defaults to "row".
+            dtype (type, optional): Floating point type to store temperatures with. Defaults to np.float32.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+        if order not in ORDERS:
+            raise ValueError(f"Unknown order {order}, expected one of {ORDERS}")
+        if backend == "cupy":
+            backend = "cuda"
+        if backend == "cuda" and not HAS_CUPY:
+            raise ImportError("CuPy is required for the cuda backend")
+
         self.mesh_size = mesh_size
-        self.nodes = []
-        self.elements = []
+        self.backend = backend
+        self.order = order
+        self.xp = cupy if backend == "cuda" else np
+        self.dtype = np.dtype(dtype).type
+        xp = self.xp
+
+        if order == "morton":
+            self._id_grid = xp.asarray(_morton_ids(mesh_size))
+        else:
+            self._id_grid = xp.arange(mesh_size**2, dtype=np.int32).reshape(
+                mesh_size, mesh_size
+            )
+        self.elements = xp.empty(((mesh_size - 1) ** 2, 4), dtype=np.int32)
+        self._alloc_temp_history(0)
+        self.is_fixed = xp.zeros((mesh_size, mesh_size), dtype=bool)
+        self.fixed_idx = xp.zeros(0, dtype=np.intp)
+        self.fixed_vals = xp.zeros(0, dtype=self.dtype)
+        self.is_boundary = xp.zeros((mesh_size, mesh_size), dtype=bool)
         self._gen_mesh()
 
+    def __getitem__(self, coords: Tuple[int, int]) -> "Node":
+        """Gets a view of the node at a given set of coordinates, e.g. mesh[x, y]"""
+        x, y = coords
+        return Node(self, x, y)
+
     def _gen_mesh(self):
-        id = 0
-        for x in range(self.mesh_size):
-            for y in range(self.mesh_size):
-                if x in [0, self.mesh_size] or y in [0, self.mesh_size]:
-                    self.nodes.append(Node(id, x, y, is_boundary_node=True))
-                else:
-                    self.nodes.append(Node(id, x, y))
-                id += 1
+        self.is_boundary[[0, -1], :] = True
+        self.is_boundary[:, [0, -1]] = True
+        self._gen_elements()
+
+    def _gen_elements(self):
+        # Each element is bounded by four nodes, ordered counterclockwise
+        ids = self._id_grid
+        corners = self.elements.reshape(self.mesh_size - 1, self.mesh_size - 1, 4)
+        corners[..., 0] = ids[:-1, :-1]
+        corners[..., 1] = ids[1:, :-1]
+        corners[..., 2] = ids[1:, 1:]
+        corners[..., 3] = ids[:-1, 1:]
 
     def init_values(
-        self, boundary_conditions: List[Tuple[int, int, float]], initial_temp: float
+        self,
+        boundary_conditions: List[Tuple[int, int, float]],
+        initial_temp: float,
+        n_steps: int,
     ):
         """Sets the initial values for the mesh
 
         Args:
             boundary_conditions (List[Tuple[int, int, float]]): In the format x, y, temperature. Only nodes with boundary conditions are specified
             initial_temp float: The value to default all node temperatures to
+            n_steps (int): The number of timesteps to allocate temperature history for
         """
+        self._alloc_temp_history(n_steps)
+
         # Set all node values
-        for node in self.nodes:
-            node.temp.append(initial_temp)
+        self.temp[:] = initial_temp
 
         # Set boundary conditions
-        for bc_tuple in boundary_conditions:
-            node_id = self.get_node_id(bc_tuple[0], bc_tuple[1])
-            self.nodes[node_id].temp[0] = bc_tuple[2]
-            self.nodes[node_id].is_fixed_temp = True
+        bcs = self.xp.asarray(boundary_conditions, dtype=np.float64).reshape(-1, 3)
+        xs, ys, vals = bcs[:, 0].astype(np.intp), bcs[:, 1].astype(np.intp), bcs[:, 2]
+        self.temp[xs, ys] = vals
+        self.is_fixed[:] = False
+        self.is_fixed[xs, ys] = True
+
+        # Flat indices into a timestep padded with ghost nodes
+        self.fixed_idx = self.xp.ravel_multi_index(
+            (xs + 1, ys + 1), (self.mesh_size + 2, self.mesh_size + 2)
+        )
+        self.fixed_vals = vals.astype(self.dtype)
+
+    def _alloc_temp_history(self, n_steps: int):
+        # Each timestep is padded with a border of ghost nodes that mirror the nodes
+        # next to the insulated walls, so the stencil never has to check for edges
+        self._temp_history = self.xp.zeros(
+            (n_steps + 1, self.mesh_size + 2, self.mesh_size + 2), dtype=self.dtype
+        )
+        self.temp_history = self._temp_history[:, 1:-1, 1:-1]
+        self.temp = self.temp_history[0]
+
+    def update_ghost_nodes(self, step: int):
+        """Mirrors the nodes next to the insulated walls into the ghost nodes for a time index
+
+        Args:
+            step (int): Time index to update the ghost nodes of
+        """
+        t = self._temp_history[step]
+        t[0, 1:-1] = t[2, 1:-1]
+        t[-1, 1:-1] = t[-3, 1:-1]
+        t[1:-1, 0] = t[1:-1, 2]
+        t[1:-1, -1] = t[1:-1, -3]
+
+    def get_neighbor_temps_all(self, step: int):
+        """Gets the temperatures of the neighbours of every node for a time index
+
+        Ghost nodes are updated first, so neighbours across insulated walls are mirrored.
+
+        Args:
+            step (int): Time index of interest
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Views of the left, right, top and bottom neighbour temperatures
+        """
+        self.update_ghost_nodes(step)
+        t = self._temp_history[step]
+        return t[:-2, 1:-1], t[2:, 1:-1], t[1:-1, 2:], t[1:-1, :-2]
+
+    def get_neighbor_temps(self, x: int, y: int):
+        """Gets the most recently calculated temperatures of the neighbours of a node
+
+        Neighbours across insulated walls are mirrored.
+
+        Returns:
+            Tuple[float, float, float, float] or None: The left, right, top and bottom neighbour temperatures, or None if the coordinates do not exist
+        """
+        if not self.contains(x, y):
+            return None
+        last = self.mesh_size - 1
+        t = self.temp
+        return (
+            t[x - 1 if x > 0 else 1, y].item(),
+            t[x + 1 if x < last else last - 1, y].item(),
+            t[x, y + 1 if y < last else last - 1].item(),
+            t[x, y - 1 if y > 0 else 1].item(),
+        )
+
+    def asnumpy(self, array) -> np.ndarray:
+        """Gets an array stored by the mesh's backend as a NumPy array on the host"""
+        if self.backend == "cuda":
+            return cupy.asnumpy(array)
+        return array
+
+    def element_mean_temps(self) -> np.ndarray:
+        """Gets the mean of the most recently calculated node temperatures for each element
+
+        Returns:
+            np.ndarray: Mean temperature of each element, ordered the same as elements
+        """
+        return self.temps_by_id(self.temp)[self.elements].sum(axis=1) * 0.25
+
+    def temps_by_id(self, temps):
+        """Flattens nodal temperatures at a timestep so they are indexed by node id
+
+        Args:
+            temps (np.ndarray): Nodal temperatures indexed by x, y coordinates
+
+        Returns:
+            np.ndarray: Nodal temperatures indexed by node id
+        """
+        temps_by_id = self.xp.empty(self.mesh_size**2, dtype=temps.dtype)
+        temps_by_id[self._id_grid] = temps
+        return temps_by_id
 
     def get_node_temp_or_none(self, x: int, y: int):
         """Gets the most recently calculated node temperature at a given set of coordinates
@@ -52,33 +232,45 @@ class Mesh:
         Returns:
             float or None: returns float if the coordinates exist and None if they do not
         """
-        try:
-            temp = self.nodes[self.get_node_id(x, y)].temp[-1]
-            return temp
-        except (IndexError, TypeError):
-            return None
+        if self.contains(x, y):
+            return self.temp[x, y].item()
+        return None
 
     def get_node_id(self, x: int, y: int):
         """Determines the node id in a mesh based on the way the mesh is generated"""
-        id = x * self.mesh_size + y
-        if id < 0:
-            return None
-        return id
+        if self.contains(x, y):
+            return int(self._id_grid[x, y])
+        return None
+
+    def contains(self, x: int, y: int) -> bool:
+        """Checks whether a set of coordinates is a node in the mesh"""
+        return 0 <= x < self.mesh_size and 0 <= y < self.mesh_size
 
 
 class Node:
+    """
+    View of a single node in a mesh. Nodal values are read from the mesh arrays.
+    """
 
-    def __init__(
-        self,
-        id: int,
-        x: float,
-        y: float,
-        is_fixed_temp: bool = False,
-        is_boundary_node=False,
-    ) -> None:
-        self.id = id
+    __slots__ = ("mesh", "x", "y")
+
+    def __init__(self, mesh: Mesh, x: int, y: int) -> None:
+        self.mesh = mesh
         self.x = x
         self.y = y
-        self.is_fixed_temp = is_fixed_temp
-        self.temp = []
-        self.is_boundary_node = is_boundary_node
+
+    @property
+    def id(self) -> int:
+        return self.mesh.get_node_id(self.x, self.y)
+
+    @property
+    def temp(self) -> np.ndarray:
+        return self.mesh.temp_history[:, self.x, self.y]
+
+    @property
+    def is_fixed_temp(self) -> bool:
+        return bool(self.mesh.is_fixed[self.x, self.y])
+
+    @property
+    def is_boundary_node(self) -> bool:
+        return bool(self.mesh.is_boundary[self.x, self.y])